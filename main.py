@@ -1,26 +1,776 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import requests
+try:
+    import httpx
+    # httpx only needs h2 once a client is built with http2=True
+    import h2
+except ImportError:
+    httpx = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 import threading
+import queue
+import weakref
 import os
 import time
 from urllib.parse import urlparse
 import json
 from datetime import datetime
 import ftplib
+import socket
+import selectors
+import errno
+import multiprocessing
+import concurrent.futures.process
+import tarfile
+import zipfile
+import shutil
+import fnmatch
+import shlex
+import subprocess
 from urllib.request import urlopen
 import urllib.error
+from collections import deque, namedtuple
+
+# Download states
+QUEUED = 'queued'
+ACTIVE = 'active'
+PAUSED = 'paused'
+DONE = 'done'
+ERROR = 'error'
+CANCELLED = 'cancelled'
+
+STATE_TRANSITIONS = {
+    QUEUED: (ACTIVE, PAUSED, CANCELLED, ERROR),
+    ACTIVE: (PAUSED, DONE, CANCELLED, ERROR),
+    PAUSED: (ACTIVE, DONE, CANCELLED, ERROR),
+    ERROR: (QUEUED,),
+    DONE: (),
+    CANCELLED: (),
+}
+TERMINAL_STATES = (DONE, ERROR, CANCELLED)
+
+STATUS_FILTERS = ['All', 'Active', 'Paused', 'Completed', 'Cancelled', 'Error']
+STATE_FILTERS = {
+    QUEUED: 'Active',
+    ACTIVE: 'Active',
+    PAUSED: 'Paused',
+    DONE: 'Completed',
+    CANCELLED: 'Cancelled',
+    ERROR: 'Error',
+}
+
+DownloadSnapshot = namedtuple('DownloadSnapshot', [
+    'id', 'url', 'protocol', 'host', 'filename', 'filepath', 'size',
+    'downloaded', 'progress', 'speed', 'state', 'status', 'error', 'retry_count'
+])
+
+class DownloadState:
+    # State of one download, shared between its worker thread and the Tk
+    # thread. Writes go through the lock; the UI reads snapshot()s.
+    __slots__ = ('id', 'url', 'protocol', 'host', 'filename', 'filepath', 'size',
+                 'downloaded', 'speed', 'state', 'error', 'thread', 'start_time',
+                 'retry_count', 'post_status', '_cond')
+    
+    def __init__(self, download_id, url, filename, filepath):
+        parsed_url = urlparse(url)
+        self.id = download_id
+        self.url = url
+        self.protocol = parsed_url.scheme.upper()
+        self.host = (parsed_url.hostname or '').lower()
+        self.filename = filename
+        self.filepath = filepath
+        self.size = 0
+        self.downloaded = 0
+        self.speed = 0
+        self.state = QUEUED
+        self.error = None
+        self.thread = None
+        self.start_time = time.time()
+        self.retry_count = 0
+        self.post_status = None
+        self._cond = threading.Condition()
+    
+    @property
+    def progress(self):
+        if self.state == DONE:
+            return 100
+        if self.size > 0:
+            return min(100, self.downloaded / self.size * 100)
+        return 0
+    
+    @property
+    def status(self):
+        if self.state == QUEUED:
+            return 'Retrying...' if self.retry_count else 'Starting...'
+        if self.state == ERROR:
+            return f'Error: {self.error}'
+        if self.state == DONE and self.post_status:
+            return f'Completed ({self.post_status})'
+        return {ACTIVE: 'Downloading...', PAUSED: 'Paused', DONE: 'Completed', CANCELLED: 'Cancelled'}[self.state]
+    
+    def _transition(self, new_state):
+        # Caller holds the lock
+        if new_state not in STATE_TRANSITIONS[self.state]:
+            return False
+        self.state = new_state
+        if new_state in TERMINAL_STATES:
+            # Nothing left to run, don't keep the worker around
+            self.thread = None
+            self.speed = 0
+        self._cond.notify_all()
+        return True
+    
+    def start(self):
+        with self._cond:
+            if self.state == QUEUED:
+                return self._transition(ACTIVE)
+            return self.state == PAUSED
+    
+    def pause(self):
+        with self._cond:
+            return self._transition(PAUSED)
+    
+    def resume(self):
+        with self._cond:
+            return self.state == PAUSED and self._transition(ACTIVE)
+    
+    def cancel(self):
+        with self._cond:
+            return self._transition(CANCELLED)
+    
+    def finish(self):
+        with self._cond:
+            return self._transition(DONE)
+    
+    def fail(self, error):
+        with self._cond:
+            if self._transition(ERROR):
+                self.error = error
+                return True
+            return False
+    
+    def retry(self, max_retries):
+        with self._cond:
+            if self.state != ERROR or self.retry_count >= max_retries:
+                return False
+            self.retry_count += 1
+            self.error = None
+            self.downloaded = 0
+            return self._transition(QUEUED)
+    
+    def wait_while_paused(self):
+        # Blocks the worker while paused; False means stop downloading
+        with self._cond:
+            while self.state == PAUSED:
+                self._cond.wait()
+            return self.state == ACTIVE
+    
+    def add_downloaded(self, amount):
+        with self._cond:
+            self.downloaded += amount
+    
+    def set_downloaded(self, amount):
+        with self._cond:
+            self.downloaded = amount
+    
+    def set_size(self, size):
+        with self._cond:
+            self.size = size
+    
+    def set_speed(self, speed):
+        with self._cond:
+            self.speed = speed
+    
+    def set_post_status(self, post_status):
+        with self._cond:
+            self.post_status = post_status
+    
+    def rename(self, filename, filepath):
+        with self._cond:
+            self.filename = filename
+            self.filepath = filepath
+    
+    def snapshot(self):
+        with self._cond:
+            return DownloadSnapshot(
+                self.id, self.url, self.protocol, self.host, self.filename, self.filepath,
+                self.size, self.downloaded, self.progress, self.speed, self.state,
+                self.status, self.error, self.retry_count
+            )
+
+class DownloadStopped(Exception):
+    # Raised from a transfer callback to abandon a cancelled download
+    pass
+
+# Delay before racing the next address (RFC 8305 "Connection Attempt Delay")
+HAPPY_EYEBALLS_DELAY = 0.25
+CONNECT_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK))
+
+def happy_eyeballs_connect(addresses, timeout=None, source_address=None, socket_options=None,
+                           delay=HAPPY_EYEBALLS_DELAY):
+    # Start a connection attempt per address, staggered by `delay` (or as soon
+    # as the previous attempt fails), and keep whichever connects first.
+    addresses = list(addresses)
+    if not isinstance(timeout, (int, float)):
+        timeout = None
+    deadline = time.monotonic() + timeout if timeout else None
+    selector = selectors.DefaultSelector()
+    pending = []
+    errors = []
+    next_attempt = 0
+    
+    try:
+        while addresses or pending:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+                
+            if addresses and (not pending or now >= next_attempt):
+                family, sock_type, proto, _, sockaddr = addresses.pop(0)
+                sock = socket.socket(family, sock_type, proto)
+                try:
+                    for option in socket_options or ():
+                        sock.setsockopt(*option)
+                    if source_address:
+                        sock.bind(source_address)
+                    sock.setblocking(False)
+                    err = sock.connect_ex(sockaddr)
+                except OSError as e:
+                    sock.close()
+                    errors.append(e)
+                    continue
+                    
+                if err not in CONNECT_IN_PROGRESS:
+                    sock.close()
+                    errors.append(OSError(err, os.strerror(err)))
+                    continue
+                    
+                selector.register(sock, selectors.EVENT_WRITE)
+                pending.append(sock)
+                next_attempt = now + delay
+                
+            wait = None if deadline is None else deadline - now
+            if addresses:
+                wait = max(0, next_attempt - now) if wait is None else max(0, min(wait, next_attempt - now))
+                
+            for key, _ in selector.select(wait):
+                sock = key.fileobj
+                selector.unregister(sock)
+                pending.remove(sock)
+                
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err == 0:
+                    sock.setblocking(True)
+                    sock.settimeout(timeout)
+                    return sock
+                    
+                sock.close()
+                errors.append(OSError(err, os.strerror(err)))
+                next_attempt = 0
+    finally:
+        for sock in pending:
+            sock.close()
+        selector.close()
+        
+    if errors:
+        raise errors[-1]
+    raise socket.timeout("timed out")
+
+class DNSCache:
+    # In-process resolver cache shared by the HTTP and FTP paths. Addresses
+    # are handed out rotated per host so repeated connections to a
+    # multi-record host spread across its A/AAAA records.
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.entries = {}
+        self.resolving = {}
+        self.rotation = {}
+        self.lock = threading.Lock()
+    
+    def resolve(self, host, port):
+        key = (host, port)
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    return self.order(key, entry[1])
+                    
+                # Only one thread resolves a given host, the rest wait for it
+                event = self.resolving.get(key)
+                if event is None:
+                    event = self.resolving[key] = threading.Event()
+                    break
+            event.wait()
+            
+        try:
+            addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+            with self.lock:
+                if self.ttl > 0:
+                    self.entries[key] = (time.monotonic() + self.ttl, addresses)
+                return self.order(key, addresses)
+        finally:
+            with self.lock:
+                del self.resolving[key]
+            event.set()
+    
+    def order(self, key, addresses):
+        # Caller holds the lock. Interleave families starting with the
+        # resolver's preferred one, rotating within each family.
+        count = self.rotation.get(key, 0)
+        self.rotation[key] = count + 1
+        
+        preferred = addresses[0][0] if addresses else None
+        first = [a for a in addresses if a[0] == preferred]
+        second = [a for a in addresses if a[0] != preferred]
+        if first:
+            first = first[count % len(first):] + first[:count % len(first)]
+        if second:
+            second = second[count % len(second):] + second[:count % len(second)]
+            
+        ordered = []
+        for index in range(max(len(first), len(second))):
+            ordered.extend(family[index] for family in (first, second) if index < len(family))
+        return ordered
+    
+    def forget(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+    
+    def connect(self, host, port, timeout=None, source_address=None, socket_options=None):
+        addresses = self.resolve(host, port)
+        try:
+            return happy_eyeballs_connect(addresses, timeout, source_address, socket_options)
+        except OSError:
+            # Every address failed, the cached records may be stale
+            self.forget(host, port)
+            raise
+    
+    def install(self):
+        # requests/urllib3 open every socket through this one function
+        from urllib3.util import connection
+        
+        def create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
+                              source_address=None, socket_options=None):
+            host, port = address
+            if host.startswith('['):
+                host = host.strip('[]')
+            return self.connect(host, port, timeout, source_address, socket_options)
+            
+        connection.create_connection = create_connection
+
+class CachedDNSFTP(ftplib.FTP):
+    # ftplib.FTP whose control connection goes through a DNSCache. Passive
+    # data connections use the literal address from PASV, so need no lookup.
+    def __init__(self, dns_cache, **kwargs):
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+    
+    def connect(self, host='', port=0, timeout=-999, source_address=None):
+        if host != '':
+            self.host = host
+        if port > 0:
+            self.port = port
+        if timeout != -999:
+            self.timeout = timeout
+        if self.timeout is not None and not self.timeout:
+            raise ValueError('Non-blocking socket (timeout=0) is not supported')
+        if source_address is not None:
+            self.source_address = source_address
+        self.sock = self.dns_cache.connect(self.host, self.port, self.timeout, self.source_address)
+        self.af = self.sock.family
+        self.file = self.sock.makefile('r', encoding=self.encoding)
+        self.welcome = self.getresp()
+        return self.welcome
+
+class CachedDNSBackend:
+    # httpcore network backend for the HTTP/2 client, so httpx connections
+    # (h2 and its HTTP/1.1 fallback) go through the same DNSCache as requests
+    def __init__(self, dns_cache):
+        import httpcore
+        self.dns_cache = dns_cache
+        self.backend = httpcore.SyncBackend()
+    
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        import httpcore
+        from httpcore._backends.sync import SyncStream
+        
+        source_address = None if local_address is None else (local_address, 0)
+        try:
+            sock = self.dns_cache.connect(host, port, timeout, source_address, socket_options)
+        except socket.timeout as e:
+            raise httpcore.ConnectTimeout(e)
+        except OSError as e:
+            raise httpcore.ConnectError(e)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return SyncStream(sock)
+    
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return self.backend.connect_unix_socket(path, timeout, socket_options)
+    
+    def sleep(self, seconds):
+        self.backend.sleep(seconds)
+
+# Post-processing runs in spawned processes so it never competes with the
+# download threads for the GIL (and Tk isn't forked into the workers).
+MP_CONTEXT = multiprocessing.get_context('spawn')
+
+STREAMABLE_TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_SUFFIXES = STREAMABLE_TAR_SUFFIXES + ('.tar.zst', '.zip', '.zst')
+
+def archive_kind(filename):
+    name = filename.lower()
+    if name.endswith(STREAMABLE_TAR_SUFFIXES):
+        return 'tar'
+    if name.endswith('.tar.zst'):
+        return 'tar.zst'
+    if name.endswith('.zip'):
+        return 'zip'
+    if name.endswith('.zst'):
+        return 'zst'
+    return None
+
+def extract_dir(filepath):
+    # archive.tar.gz -> archive/ next to the download
+    name = os.path.basename(filepath)
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return os.path.join(os.path.dirname(filepath), name or 'extracted')
+
+def extract_tar(tar, dest):
+    if hasattr(tarfile, 'data_filter'):
+        tar.extractall(dest, filter='data')
+        return
+        
+    # Older Pythons: refuse members that would land outside dest
+    root = os.path.realpath(dest)
+    for member in tar:
+        target = os.path.realpath(os.path.join(dest, member.name))
+        if os.path.commonpath([root, target]) != root or member.issym() or member.islnk():
+            raise Exception(f"Unsafe path in archive: {member.name}")
+        tar.extract(member, dest)
+
+def extract_archive(filepath):
+    # Returns where the contents went: a directory next to the archive, or
+    # the decompressed file itself for a bare .zst
+    kind = archive_kind(filepath)
+    dest = extract_dir(filepath)
+    if kind == 'tar':
+        with tarfile.open(filepath, 'r:*') as tar:
+            extract_tar(tar, dest)
+    elif kind == 'zip':
+        with zipfile.ZipFile(filepath) as archive:
+            archive.extractall(dest)
+    elif kind in ('tar.zst', 'zst'):
+        if zstandard is None:
+            raise Exception("zstandard is not installed")
+        with open(filepath, 'rb') as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f)
+            if kind == 'tar.zst':
+                with tarfile.open(fileobj=reader, mode='r|') as tar:
+                    extract_tar(tar, dest)
+            else:
+                dest = filepath[:-len('.zst')]
+                with open(dest, 'wb') as out:
+                    shutil.copyfileobj(reader, out)
+    return dest
+
+def parse_move_rules(rules):
+    # "*.iso=~/ISOs; *.mp4=~/Videos" -> [('*.iso', '/home/me/ISOs'), ...]
+    parsed = []
+    for rule in rules.split(';'):
+        pattern, sep, target = rule.partition('=')
+        if sep and pattern.strip() and target.strip():
+            parsed.append((pattern.strip().lower(), os.path.expanduser(target.strip())))
+    return parsed
+
+def move_into(path, target):
+    destination = os.path.join(target, os.path.basename(path))
+    # shutil.move would nest a directory inside an existing one of that name
+    if os.path.isdir(path) and os.path.exists(destination):
+        raise Exception(f"{destination} already exists")
+    return shutil.move(path, destination)
+
+def run_post_pipeline(filepath, steps, extracted=None):
+    # Runs in a pool worker. Returns the final path of the downloaded file.
+    # Extracted output (from this pipeline or a StreamingExtractor) is
+    # moved along with the archive.
+    for step, arg in steps:
+        if step == 'extract':
+            extracted = extract_archive(filepath)
+        elif step == 'move':
+            os.makedirs(arg, exist_ok=True)
+            if extracted and os.path.exists(extracted):
+                extracted = move_into(extracted, arg)
+            filepath = move_into(filepath, arg)
+        elif step == 'command':
+            args = [part.replace('{file}', filepath) for part in shlex.split(arg, posix=os.name != 'nt')]
+            subprocess.run(args, check=True, timeout=3600)
+    return filepath
+
+class PipeReader:
+    # File-like reader over the bytes a StreamingExtractor sends; an empty
+    # message marks the end of the download.
+    def __init__(self, conn):
+        self.conn = conn
+        self.buffer = bytearray()
+        self.eof = False
+    
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            data = self.conn.recv_bytes()
+            if data:
+                self.buffer += data
+            else:
+                self.eof = True
+                
+        if size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+def extract_tar_stream(conn, dest):
+    # Child process side of StreamingExtractor
+    try:
+        with tarfile.open(fileobj=PipeReader(conn), mode='r|*') as tar:
+            extract_tar(tar, dest)
+        conn.send((True, dest))
+    except Exception as e:
+        conn.send((False, str(e)))
+    finally:
+        conn.close()
+
+class StreamingExtractor:
+    # Unpacks a tar archive in a child process as its bytes arrive, so the
+    # finished archive never has to be read back from disk. Pipe writes
+    # happen on a feeder thread; if the child falls too far behind, feed()
+    # gives up instead of blocking the download and the archive is
+    # extracted from disk afterwards.
+    MAX_QUEUED_BYTES = 32 * 1024 * 1024
+    
+    def __init__(self, dest, slots):
+        self.slots = slots
+        self.broken = False
+        self.overflowed = False
+        self.closed = False
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.queued_bytes = 0
+        self.conn, child_conn = MP_CONTEXT.Pipe()
+        self.process = MP_CONTEXT.Process(target=extract_tar_stream, args=(child_conn, dest), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.feeder = threading.Thread(target=self.feed_pipe, daemon=True)
+        self.feeder.start()
+    
+    def feed_pipe(self):
+        # Feeder thread. b'' is sent on as the end marker, None just stops.
+        while True:
+            data = self.queue.get()
+            if data is None:
+                return
+            if not self.broken:
+                try:
+                    self.conn.send_bytes(data)
+                except OSError:
+                    # The child gave up (bad archive); keep draining the queue
+                    self.broken = True
+            with self.lock:
+                self.queued_bytes -= len(data)
+            if not data:
+                return
+    
+    def feed(self, data):
+        if self.broken or self.overflowed:
+            return
+        with self.lock:
+            if self.queued_bytes + len(data) > self.MAX_QUEUED_BYTES:
+                self.overflowed = True
+            else:
+                self.queued_bytes += len(data)
+        if self.overflowed:
+            self.abort()
+        else:
+            self.queue.put(data)
+    
+    def claim(self):
+        # Only one of close()/abort() gets to tear down the child
+        with self.lock:
+            if self.closed:
+                return False
+            self.closed = True
+            return True
+    
+    def close(self):
+        # Returns (ok, dest or error message)
+        if not self.claim():
+            return False, "extractor closed"
+        try:
+            self.queue.put(b'')
+            self.feeder.join()
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            return False, str(e) or "extractor exited"
+        finally:
+            self.conn.close()
+            self.process.join()
+            self.slots.release()
+    
+    def abort(self):
+        if not self.claim():
+            return
+        # Killing the child first fails any pipe write the feeder is stuck in
+        self.process.terminate()
+        self.process.join()
+        self.queue.put(None)
+        self.feeder.join()
+        self.conn.close()
+        self.slots.release()
+
+class DownloadListModel:
+    # Filtered/sorted view over the downloads dict. Only ids are kept here,
+    # the Treeview is handed one visible slice at a time.
+    SORT_KEYS = {
+        'filename': lambda info: info.filename.lower(),
+        'host': lambda info: info.host,
+        'protocol': lambda info: info.protocol,
+        'size': lambda info: info.size,
+        'progress': lambda info: info.progress,
+        'speed': lambda info: info.speed,
+        'status': lambda info: info.state,
+    }
+    # These change while downloading, so the view is re-sorted on every refresh
+    VOLATILE_KEYS = ('progress', 'speed', 'status')
+    
+    def __init__(self, downloads):
+        self.downloads = downloads
+        self.order = []
+        self.view = []
+        self.positions = {}
+        self.sort_column = None
+        self.sort_reverse = False
+        self.status_filter = 'All'
+        self.host_filter = ''
+        self.min_size = 0
+        self.dirty = True
+    
+    def add(self, download_id):
+        self.order.append(download_id)
+        self.dirty = True
+    
+    def remove_many(self, download_ids):
+        removed = set(download_ids)
+        if removed:
+            self.order = [download_id for download_id in self.order if download_id not in removed]
+            self.dirty = True
+    
+    def set_sort(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.dirty = True
+    
+    def set_filter(self, status='All', host='', min_size=0):
+        self.status_filter = status
+        self.host_filter = host.strip().lower()
+        self.min_size = min_size
+        self.dirty = True
+    
+    def matches(self, info):
+        if self.status_filter != 'All' and STATE_FILTERS[info.state] != self.status_filter:
+            return False
+        if self.host_filter and self.host_filter not in info.host:
+            return False
+        if self.min_size and info.size < self.min_size:
+            return False
+        return True
+    
+    def invalidate(self):
+        # A download changed state, size or name; that only moves rows
+        # around when a filter or sort depends on it
+        if self.sort_column or self.status_filter != 'All' or self.min_size:
+            self.dirty = True
+    
+    def refresh(self):
+        if not self.dirty and self.sort_column not in self.VOLATILE_KEYS:
+            return
+            
+        downloads = self.downloads
+        view = [download_id for download_id in self.order
+                if download_id in downloads and self.matches(downloads[download_id])]
+                
+        if self.sort_column:
+            key = self.SORT_KEYS[self.sort_column]
+            view.sort(key=lambda download_id: key(downloads[download_id]), reverse=self.sort_reverse)
+            
+        self.view = view
+        self.positions = {download_id: index for index, download_id in enumerate(view)}
+        self.dirty = False
+    
+    def slice(self, start, count):
+        return self.view[start:start + count]
+    
+    def index_of(self, download_id):
+        return self.positions.get(download_id, -1)
+    
+    def __len__(self):
+        return len(self.view)
+
+def append_json_list(path, entries):
+    # Extend a JSON array file written by json.dump(indent=2) in place,
+    # without reading or re-serializing what's already there
+    if not os.path.exists(path):
+        return False
+        
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        f.seek(max(0, end - 64))
+        tail = f.read()
+        
+        close = tail.rfind(b']')
+        prefix = tail[:close].rstrip()
+        if close < 0 or not prefix:
+            return False
+            
+        body = ',\n'.join('  ' + json.dumps(entry, indent=2).replace('\n', '\n  ') for entry in entries)
+        f.seek(end - len(tail) + len(prefix))
+        f.truncate()
+        f.write((b'\n' if prefix.endswith(b'[') else b',\n') + body.encode() + b'\n]')
+    return True
 
 class DownloadManager:
     def __init__(self, root):
         self.root = root
         self.root.title("Advanced Download Manager")
-        self.root.geometry("900x700")
+        self.root.geometry("900x800")
         
         # Download data
         self.downloads = {}
         self.download_history = []
         self.download_counter = 0
+        self.finished_ids = deque()
+        self.history_lock = threading.Lock()
+        self.history_file_lock = threading.Lock()
+        self.history_unsaved = []
+        self.history_save_pending = False
+        
+        # Virtualized list state
+        self.list_model = DownloadListModel(self.downloads)
+        self.view_offset = 0
+        self.visible_rows = 12
+        self.visible_ids = []
+        self.row_values = []
+        self.selected_id = None
+        self.refresh_pending = False
         
         # Default download directory
         self.download_dir = os.path.expanduser("~/Downloads")
@@ -37,13 +787,42 @@ class DownloadManager:
             'proxy_enabled': False,
             'proxy_host': '',
             'proxy_port': '',
-            'ftp_passive': True
+            'ftp_passive': True,
+            'finished_keep': 100,
+            'dns_ttl': 300,
+            'http2_hosts': '',
+            'post_extract': False,
+            'post_move_rules': '',
+            'post_command': '',
+            'post_workers': 2
         }
         
         self.create_widgets()
         self.load_history()
         self.load_settings()
         
+        # Shared DNS cache for HTTP and FTP connections
+        self.dns_cache = DNSCache(self.settings['dns_ttl'])
+        self.dns_cache.install()
+        
+        # Shared HTTP/2 client, created on first use
+        self.http2_client = None
+        self.http2_config = None
+        self.http2_streams = {}
+        self.http2_lock = threading.Lock()
+        
+        # Post-processing process pool, created on first use
+        self.post_pool = None
+        self.post_closed = False
+        self.retired_post_pools = []
+        self.stream_extractors = weakref.WeakSet()
+        self.post_lock = threading.Lock()
+        # One slot per CPU-heavy process: pool jobs and streaming extractors
+        self.post_workers = max(1, self.settings['post_workers'])
+        self.post_slots = threading.BoundedSemaphore(self.post_workers)
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
     def create_widgets(self):
         # Create notebook for tabs
         self.notebook = ttk.Notebook(self.root)
@@ -97,34 +876,67 @@ class DownloadManager:
         self.status_label = ttk.Label(main_frame, text="Ready", foreground="green")
         self.status_label.grid(row=3, column=0, columnspan=2, sticky=tk.W, pady=(0, 10))
         
-        # Downloads treeview
-        self.tree = ttk.Treeview(main_frame, columns=('filename', 'protocol', 'size', 'progress', 'speed', 'status'), show='headings', height=12)
-        self.tree.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
-        
-        # Treeview headings
-        self.tree.heading('filename', text='Filename')
-        self.tree.heading('protocol', text='Protocol')
-        self.tree.heading('size', text='Size')
-        self.tree.heading('progress', text='Progress')
-        self.tree.heading('speed', text='Speed')
-        self.tree.heading('status', text='Status')
-        
+        # Filter frame
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        
+        ttk.Label(filter_frame, text="Status:").grid(row=0, column=0, sticky=tk.W)
+        self.status_filter_var = tk.StringVar(value='All')
+        ttk.Combobox(filter_frame, textvariable=self.status_filter_var,
+                     values=STATUS_FILTERS, width=10, state='readonly').grid(row=0, column=1, padx=(5, 10))
+                     
+        ttk.Label(filter_frame, text="Host:").grid(row=0, column=2, sticky=tk.W)
+        self.host_filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.host_filter_var, width=20).grid(row=0, column=3, padx=(5, 10))
+        
+        ttk.Label(filter_frame, text="Min Size (MB):").grid(row=0, column=4, sticky=tk.W)
+        self.min_size_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.min_size_var, width=8).grid(row=0, column=5, padx=(5, 0))
+        
+        for var in (self.status_filter_var, self.host_filter_var, self.min_size_var):
+            var.trace_add('write', lambda *args: self.apply_filters())
+            
+        # Downloads treeview. Only the visible window of rows exists in the
+        # tree; the scrollbar drives an offset into self.list_model instead.
+        self.tree_columns = ('filename', 'host', 'protocol', 'size', 'progress', 'speed', 'status')
+        self.tree = ttk.Treeview(main_frame, columns=self.tree_columns, show='headings', height=12, selectmode='browse')
+        self.tree.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        
+        # Treeview headings (click to sort)
+        self.tree_headings = {
+            'filename': 'Filename',
+            'host': 'Host',
+            'protocol': 'Protocol',
+            'size': 'Size',
+            'progress': 'Progress',
+            'speed': 'Speed',
+            'status': 'Status',
+        }
+        for column, text in self.tree_headings.items():
+            self.tree.heading(column, text=text, command=lambda c=column: self.sort_by(c))
+            
         # Column widths
         self.tree.column('filename', width=200)
-        self.tree.column('protocol', width=80)
-        self.tree.column('size', width=100)
-        self.tree.column('progress', width=100)
-        self.tree.column('speed', width=100)
+        self.tree.column('host', width=120)
+        self.tree.column('protocol', width=70)
+        self.tree.column('size', width=90)
+        self.tree.column('progress', width=80)
+        self.tree.column('speed', width=90)
         self.tree.column('status', width=120)
         
         # Scrollbar for treeview
-        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        scrollbar.grid(row=4, column=2, sticky=(tk.N, tk.S))
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree_scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.on_tree_scroll)
+        self.tree_scrollbar.grid(row=5, column=2, sticky=(tk.N, tk.S))
+        
+        self.tree.bind('<Configure>', self.on_tree_resize)
+        self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        self.tree.bind('<MouseWheel>', self.on_tree_wheel)
+        self.tree.bind('<Button-4>', self.on_tree_wheel)
+        self.tree.bind('<Button-5>', self.on_tree_wheel)
         
         # Control buttons
         control_frame = ttk.Frame(main_frame)
-        control_frame.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        control_frame.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E))
         
         ttk.Button(control_frame, text="Pause", command=self.pause_download).grid(row=0, column=0, padx=(0, 5))
         ttk.Button(control_frame, text="Resume", command=self.resume_download).grid(row=0, column=1, padx=(0, 5))
@@ -136,7 +948,7 @@ class DownloadManager:
         self.downloads_frame.columnconfigure(0, weight=1)
         self.downloads_frame.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(4, weight=1)
+        main_frame.rowconfigure(5, weight=1)
         url_frame.columnconfigure(1, weight=1)
         
     def create_settings_tab(self):
@@ -167,16 +979,35 @@ class DownloadManager:
         self.verify_ssl_var = tk.BooleanVar(value=self.settings['verify_ssl'])
         ttk.Checkbutton(conn_frame, text="Verify SSL Certificates", variable=self.verify_ssl_var).grid(row=4, column=0, columnspan=2, sticky=tk.W, pady=2)
         
+        ttk.Label(conn_frame, text="Keep Finished in List:").grid(row=5, column=0, sticky=tk.W, pady=2)
+        self.finished_keep_var = tk.StringVar(value=str(self.settings['finished_keep']))
+        ttk.Entry(conn_frame, textvariable=self.finished_keep_var, width=10).grid(row=5, column=1, padx=(5, 0), sticky=tk.W)
+        
+        ttk.Label(conn_frame, text="DNS Cache TTL (seconds):").grid(row=6, column=0, sticky=tk.W, pady=2)
+        self.dns_ttl_var = tk.StringVar(value=str(self.settings['dns_ttl']))
+        ttk.Entry(conn_frame, textvariable=self.dns_ttl_var, width=10).grid(row=6, column=1, padx=(5, 0), sticky=tk.W)
+        
+        # HTTP/2 Settings
+        http2_frame = ttk.LabelFrame(settings_main, text="HTTP/2 Settings", padding="10")
+        http2_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        ttk.Label(http2_frame, text="HTTP/2 Hosts (comma separated, * for all):").grid(row=0, column=0, sticky=tk.W, pady=2)
+        self.http2_hosts_var = tk.StringVar(value=self.settings['http2_hosts'])
+        ttk.Entry(http2_frame, textvariable=self.http2_hosts_var, width=40).grid(row=0, column=1, padx=(5, 0), sticky=(tk.W, tk.E))
+        
+        if httpx is None:
+            ttk.Label(http2_frame, text="Install httpx[http2] to enable HTTP/2", foreground="gray").grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=2)
+            
         # FTP Settings
         ftp_frame = ttk.LabelFrame(settings_main, text="FTP Settings", padding="10")
-        ftp_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        ftp_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
         self.ftp_passive_var = tk.BooleanVar(value=self.settings['ftp_passive'])
         ttk.Checkbutton(ftp_frame, text="Use Passive Mode", variable=self.ftp_passive_var).grid(row=0, column=0, sticky=tk.W, pady=2)
         
         # Proxy Settings
         proxy_frame = ttk.LabelFrame(settings_main, text="Proxy Settings", padding="10")
-        proxy_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        proxy_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
         self.proxy_enabled_var = tk.BooleanVar(value=self.settings['proxy_enabled'])
         ttk.Checkbutton(proxy_frame, text="Enable Proxy", variable=self.proxy_enabled_var).grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=2)
@@ -191,14 +1022,33 @@ class DownloadManager:
         
         # User Agent
         ua_frame = ttk.LabelFrame(settings_main, text="User Agent", padding="10")
-        ua_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        ua_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
         self.user_agent_var = tk.StringVar(value=self.settings['user_agent'])
         ttk.Entry(ua_frame, textvariable=self.user_agent_var, width=60).grid(row=0, column=0, sticky=(tk.W, tk.E))
         
+        # Post-Processing Settings
+        post_frame = ttk.LabelFrame(settings_main, text="Post-Processing", padding="10")
+        post_frame.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        self.post_extract_var = tk.BooleanVar(value=self.settings['post_extract'])
+        ttk.Checkbutton(post_frame, text="Extract archives (zip, tar.gz, zst)", variable=self.post_extract_var).grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=2)
+        
+        ttk.Label(post_frame, text="Move Rules (*.iso=~/ISOs; ...):").grid(row=1, column=0, sticky=tk.W, pady=2)
+        self.post_move_rules_var = tk.StringVar(value=self.settings['post_move_rules'])
+        ttk.Entry(post_frame, textvariable=self.post_move_rules_var, width=40).grid(row=1, column=1, padx=(5, 0), sticky=(tk.W, tk.E))
+        
+        ttk.Label(post_frame, text="Command ({file} = path):").grid(row=2, column=0, sticky=tk.W, pady=2)
+        self.post_command_var = tk.StringVar(value=self.settings['post_command'])
+        ttk.Entry(post_frame, textvariable=self.post_command_var, width=40).grid(row=2, column=1, padx=(5, 0), sticky=(tk.W, tk.E))
+        
+        ttk.Label(post_frame, text="Worker Processes:").grid(row=3, column=0, sticky=tk.W, pady=2)
+        self.post_workers_var = tk.StringVar(value=str(self.settings['post_workers']))
+        ttk.Entry(post_frame, textvariable=self.post_workers_var, width=10).grid(row=3, column=1, padx=(5, 0), sticky=tk.W)
+        
         # Buttons
         button_frame = ttk.Frame(settings_main)
-        button_frame.grid(row=4, column=0, columnspan=2, pady=10)
+        button_frame.grid(row=6, column=0, columnspan=2, pady=10)
         
         ttk.Button(button_frame, text="Save Settings", command=self.save_settings).grid(row=0, column=0, padx=(0, 5))
         ttk.Button(button_frame, text="Reset to Defaults", command=self.reset_settings).grid(row=0, column=1, padx=(0, 5))
@@ -208,6 +1058,8 @@ class DownloadManager:
         self.settings_frame.rowconfigure(0, weight=1)
         settings_main.columnconfigure(1, weight=1)
         conn_frame.columnconfigure(1, weight=1)
+        http2_frame.columnconfigure(1, weight=1)
+        post_frame.columnconfigure(1, weight=1)
         ua_frame.columnconfigure(0, weight=1)
         
     def choose_directory(self):
@@ -234,13 +1086,19 @@ class DownloadManager:
                 
                 if parsed_url.scheme == 'ftp':
                     # Test FTP connection
-                    ftp = ftplib.FTP(timeout=self.settings['timeout'])
-                    if self.settings['ftp_passive']:
-                        ftp.set_pasv(True)
+                    ftp = self.create_ftp()
                     ftp.connect(parsed_url.hostname, parsed_url.port or 21)
                     ftp.login()
                     ftp.quit()
                     message = "FTP connection successful"
+                elif self.use_http2(url):
+                    # Test HTTP/2, falls back to HTTP/1.1 if the server doesn't offer h2
+                    client = self.get_http2_client()
+                    try:
+                        response = client.head(url)
+                    finally:
+                        self.release_http2_client(client)
+                    message = f"{response.http_version} connection successful (Status: {response.status_code})"
                 else:
                     # Test HTTP/HTTPS connection
                     session = self.create_session()
@@ -282,6 +1140,84 @@ class DownloadManager:
         
         return session
     
+    def use_http2(self, url):
+        parsed_url = urlparse(url)
+        if httpx is None or parsed_url.scheme != 'https':
+            return False
+            
+        # HTTP/2 is negotiated via ALPN, so it only applies to https hosts
+        hosts = [host.strip().lower() for host in self.settings['http2_hosts'].split(',') if host.strip()]
+        return '*' in hosts or (parsed_url.hostname or '').lower() in hosts
+    
+    def http2_settings(self):
+        proxy = None
+        if self.settings['proxy_enabled'] and self.settings['proxy_host']:
+            proxy = f"http://{self.settings['proxy_host']}:{self.settings['proxy_port']}"
+            
+        return (proxy, self.settings['verify_ssl'], self.settings['timeout'],
+                self.settings['user_agent'], self.settings['max_retries'])
+    
+    def get_http2_client(self):
+        # One client for all HTTP/2 downloads; requests to the same origin
+        # are multiplexed as streams over a single connection. Every call
+        # must be paired with release_http2_client().
+        with self.http2_lock:
+            if self.http2_client is None:
+                self.http2_config = self.http2_settings()
+                proxy, verify, timeout, user_agent, retries = self.http2_config
+                transport = httpx.HTTPTransport(
+                    http2=True,
+                    verify=verify,
+                    proxy=proxy,
+                    retries=retries,
+                )
+                # httpx has no option for this; swap the pool's backend so
+                # connections use the shared DNS cache and happy eyeballs
+                transport._pool._network_backend = CachedDNSBackend(self.dns_cache)
+                self.http2_client = httpx.Client(
+                    headers={'User-Agent': user_agent},
+                    timeout=timeout,
+                    follow_redirects=True,
+                    transport=transport,
+                )
+                self.http2_streams[self.http2_client] = 0
+                
+            self.http2_streams[self.http2_client] += 1
+            return self.http2_client
+    
+    def release_http2_client(self, client):
+        with self.http2_lock:
+            self.http2_streams[client] -= 1
+            retired = client is not self.http2_client and not self.http2_streams[client]
+            if retired:
+                del self.http2_streams[client]
+                
+        if retired:
+            client.close()
+    
+    def reset_http2_client(self):
+        # Only rebuild when a setting the client was built with changed; a
+        # replaced client is closed once its in-flight downloads finish
+        with self.http2_lock:
+            client = self.http2_client
+            if client is None or self.http2_config == self.http2_settings():
+                return
+                
+            self.http2_client = None
+            retired = not self.http2_streams[client]
+            if retired:
+                del self.http2_streams[client]
+                
+        if retired:
+            client.close()
+    
+    def create_ftp(self):
+        ftp = CachedDNSFTP(self.dns_cache, timeout=self.settings['timeout'])
+        if self.settings['ftp_passive']:
+            ftp.set_pasv(True)
+            
+        return ftp
+    
     def add_download(self):
         url = self.url_var.get().strip()
         if not url:
@@ -301,71 +1237,58 @@ class DownloadManager:
         filename = os.path.basename(parsed_url.path) or f"download_{self.download_counter}"
         
         # Create download entry
-        download_info = {
-            'id': download_id,
-            'url': url,
-            'protocol': parsed_url.scheme.upper(),
-            'filename': filename,
-            'filepath': os.path.join(self.download_dir, filename),
-            'size': 0,
-            'downloaded': 0,
-            'progress': 0,
-            'speed': 0,
-            'status': 'Starting...',
-            'paused': False,
-            'cancelled': False,
-            'error': None,
-            'thread': None,
-            'start_time': time.time(),
-            'retry_count': 0
-        }
+        download = DownloadState(download_id, url, filename, os.path.join(self.download_dir, filename))
         
-        self.downloads[download_id] = download_info
+        self.downloads[download_id] = download
         
-        # Add to treeview
-        self.tree.insert('', 'end', iid=download_id, values=(
-            filename, parsed_url.scheme.upper(), "0 B", "0%", "0 B/s", "Starting..."
-        ))
+        # Add to list model, the tree picks it up on the next refresh
+        self.list_model.add(download_id)
+        self.schedule_refresh()
         
         # Start download thread
         thread = threading.Thread(target=self.download_file, args=(download_id,))
         thread.daemon = True
-        download_info['thread'] = thread
+        download.thread = thread
         thread.start()
         
         # Clear URL entry
         self.url_var.set("")
     
     def download_file(self, download_id):
-        download_info = self.downloads[download_id]
+        download = self.downloads[download_id]
         
         try:
-            parsed_url = urlparse(download_info['url'])
+            if not download.start():
+                return
+                
+            parsed_url = urlparse(download.url)
             
             if parsed_url.scheme == 'ftp':
                 self.download_ftp(download_id)
+            elif self.use_http2(download.url):
+                self.download_http2(download_id)
             else:
                 self.download_http(download_id)
                 
         except Exception as e:
-            download_info['status'] = f'Error: {str(e)}'
-            download_info['error'] = str(e)
+            download.fail(str(e))
             self.root.after(0, self.update_download_display, download_id)
     
     def download_http(self, download_id):
-        download_info = self.downloads[download_id]
+        download = self.downloads[download_id]
         session = self.create_session()
+        extractor = None
         
         try:
             # Get file info
-            response = session.head(download_info['url'], timeout=self.settings['timeout'])
+            response = session.head(download.url, timeout=self.settings['timeout'])
             
             if response.status_code not in [200, 301, 302]:
                 raise Exception(f"HTTP {response.status_code}")
                 
             # Get file size
             file_size = int(response.headers.get('content-length', 0))
-            download_info['size'] = file_size
+            download.set_size(file_size)
             
             # Update filename if Content-Disposition header exists
             if 'content-disposition' in response.headers:
@@ -374,156 +1297,547 @@ class DownloadManager:
                 filename_match = re.findall('filename="(.+)"', cd)
                 if filename_match:
                     new_filename = filename_match[0]
-                    download_info['filename'] = new_filename
-                    download_info['filepath'] = os.path.join(self.download_dir, new_filename)
+                    download.rename(new_filename, os.path.join(self.download_dir, new_filename))
             
             # Start actual download
             headers = {}
-            if os.path.exists(download_info['filepath']):
-                download_info['downloaded'] = os.path.getsize(download_info['filepath'])
-                headers['Range'] = f"bytes={download_info['downloaded']}-"
+            if os.path.exists(download.filepath):
+                download.set_downloaded(os.path.getsize(download.filepath))
+                headers['Range'] = f"bytes={download.downloaded}-"
             
-            response = session.get(download_info['url'], headers=headers, stream=True, 
+            response = session.get(download.url, headers=headers, stream=True, 
                                  timeout=self.settings['timeout'])
             
             if response.status_code not in [200, 206]:
                 raise Exception(f"HTTP {response.status_code}")
             
             # Open file for writing
-            mode = 'ab' if download_info['downloaded'] > 0 else 'wb'
+            mode = 'ab' if download.downloaded > 0 else 'wb'
+            extractor = self.open_stream_extractor(download, mode)
             
-            with open(download_info['filepath'], mode) as f:
+            with open(download.filepath, mode) as f:
                 last_update = time.time()
-                last_downloaded = download_info['downloaded']
+                last_downloaded = download.downloaded
                 
                 for chunk in response.iter_content(chunk_size=self.settings['chunk_size']):
-                    if download_info['cancelled']:
+                    if not download.wait_while_paused():
                         break
-                        
-                    while download_info['paused'] and not download_info['cancelled']:
-                        time.sleep(0.1)
                     
                     if chunk:
                         f.write(chunk)
-                        download_info['downloaded'] += len(chunk)
+                        if extractor:
+                            extractor.feed(chunk)
+                        download.add_downloaded(len(chunk))
                         
                         # Update progress every 0.5 seconds
                         current_time = time.time()
                         if current_time - last_update >= 0.5:
-                            self.update_progress(download_info, current_time, last_update, last_downloaded)
+                            self.update_progress(download, current_time, last_update, last_downloaded)
                             last_update = current_time
-                            last_downloaded = download_info['downloaded']
+                            last_downloaded = download.downloaded
             
             # Final update
-            if not download_info['cancelled']:
-                download_info['status'] = 'Completed'
-                download_info['progress'] = 100
-                self.root.after(0, self.update_download_display, download_id)
-                self.add_to_history(download_info)
+            if download.finish():
+                self.root.after(0, self.mark_finished, download_id)
+                self.post_process(download, extractor)
+            elif extractor:
+                extractor.abort()
                 
         except Exception as e:
-            download_info['status'] = f'Error: {str(e)}'
-            download_info['error'] = str(e)
+            if extractor:
+                extractor.abort()
+            download.fail(str(e))
             self.root.after(0, self.update_download_display, download_id)
     
+    def download_http2(self, download_id):
+        download = self.downloads[download_id]
+        client = self.get_http2_client()
+        extractor = None
+        
+        try:
+            # No separate HEAD request; size and filename come from the GET
+            response = self.open_http2_response(client, download)
+            try:
+                content_length = int(response.headers.get('content-length', 0))
+                download.set_size(download.downloaded + content_length if content_length else 0)
+                
+                # Open file for writing
+                mode = 'ab' if download.downloaded > 0 else 'wb'
+                extractor = self.open_stream_extractor(download, mode)
+                
+                with open(download.filepath, mode) as f:
+                    last_update = time.time()
+                    last_downloaded = download.downloaded
+                    
+                    for chunk in response.iter_bytes(chunk_size=self.settings['chunk_size']):
+                        if not download.wait_while_paused():
+                            break
+                            
+                        if chunk:
+                            f.write(chunk)
+                            if extractor:
+                                extractor.feed(chunk)
+                            download.add_downloaded(len(chunk))
+                            
+                            # Update progress every 0.5 seconds
+                            current_time = time.time()
+                            if current_time - last_update >= 0.5:
+                                self.update_progress(download, current_time, last_update, last_downloaded)
+                                last_update = current_time
+                                last_downloaded = download.downloaded
+            finally:
+                response.close()
+                
+            # Final update
+            if download.finish():
+                self.root.after(0, self.mark_finished, download_id)
+                self.post_process(download, extractor)
+            elif extractor:
+                extractor.abort()
+                
+        except Exception as e:
+            if extractor:
+                extractor.abort()
+            download.fail(str(e))
+            self.root.after(0, self.update_download_display, download_id)
+        finally:
+            self.release_http2_client(client)
+    
+    def open_http2_response(self, client, download):
+        # The filename (and so the file to resume) is only known from the
+        # response, so a rename after a Range request, or onto a file that
+        # already exists, means asking again.
+        for attempt in range(2):
+            headers = {}
+            download.set_downloaded(0)
+            if os.path.exists(download.filepath):
+                download.set_downloaded(os.path.getsize(download.filepath))
+                headers['Range'] = f"bytes={download.downloaded}-"
+                
+            request = client.build_request('GET', download.url, headers=headers)
+            response = client.send(request, stream=True)
+            try:
+                if response.status_code not in [200, 206]:
+                    raise Exception(f"HTTP {response.status_code}")
+                    
+                # Update filename if Content-Disposition header exists
+                if 'content-disposition' in response.headers:
+                    import re
+                    cd = response.headers['content-disposition']
+                    filename_match = re.findall('filename="(.+)"', cd)
+                    new_filepath = os.path.join(self.download_dir, filename_match[0]) if filename_match else download.filepath
+                    if new_filepath != download.filepath:
+                        download.rename(filename_match[0], new_filepath)
+                        # The offset was for the old name, or the new file is
+                        # already partly there: request the new file's tail
+                        if headers or os.path.exists(new_filepath):
+                            if attempt:
+                                raise Exception("Server changed the filename between requests")
+                            response.close()
+                            continue
+                            
+                # Server ignored the Range header, start over
+                if response.status_code == 200:
+                    download.set_downloaded(0)
+                    
+                return response
+            except Exception:
+                response.close()
+                raise
+    
     def download_ftp(self, download_id):
-        download_info = self.downloads[download_id]
-        parsed_url = urlparse(download_info['url'])
+        download = self.downloads[download_id]
+        parsed_url = urlparse(download.url)
+        extractor = None
         
         try:
-            ftp = ftplib.FTP(timeout=self.settings['timeout'])
-            if self.settings['ftp_passive']:
-                ftp.set_pasv(True)
-            
+            ftp = self.create_ftp()
             ftp.connect(parsed_url.hostname, parsed_url.port or 21)
             ftp.login(parsed_url.username or 'anonymous', parsed_url.password or '')
             
             # Get file size
             try:
-                file_size = ftp.size(parsed_url.path)
-                download_info['size'] = file_size
+                download.set_size(ftp.size(parsed_url.path))
             except:
-                download_info['size'] = 0
+                download.set_size(0)
             
             # Open file for writing
-            mode = 'ab' if os.path.exists(download_info['filepath']) else 'wb'
+            mode = 'ab' if os.path.exists(download.filepath) else 'wb'
             if mode == 'ab':
-                download_info['downloaded'] = os.path.getsize(download_info['filepath'])
-                ftp.sendcmd(f'REST {download_info["downloaded"]}')
+                download.set_downloaded(os.path.getsize(download.filepath))
+                ftp.sendcmd(f'REST {download.downloaded}')
+            extractor = self.open_stream_extractor(download, mode)
             
-            with open(download_info['filepath'], mode) as f:
+            with open(download.filepath, mode) as f:
                 last_update = time.time()
-                last_downloaded = download_info['downloaded']
+                last_downloaded = download.downloaded
                 
                 def callback(data):
-                    if download_info['cancelled']:
-                        return
-                    
-                    while download_info['paused'] and not download_info['cancelled']:
-                        time.sleep(0.1)
+                    nonlocal last_update, last_downloaded
+                    if not download.wait_while_paused():
+                        raise DownloadStopped()
                     
                     f.write(data)
-                    download_info['downloaded'] += len(data)
+                    if extractor:
+                        extractor.feed(data)
+                    download.add_downloaded(len(data))
                     
                     current_time = time.time()
                     if current_time - last_update >= 0.5:
-                        self.update_progress(download_info, current_time, last_update, last_downloaded)
-                        last_update, last_downloaded
+                        self.update_progress(download, current_time, last_update, last_downloaded)
                         last_update = current_time
-                        last_downloaded = download_info['downloaded']
+                        last_downloaded = download.downloaded
                 
-                ftp.retrbinary(f'RETR {parsed_url.path}', callback, self.settings['chunk_size'])
+                try:
+                    ftp.retrbinary(f'RETR {parsed_url.path}', callback, self.settings['chunk_size'])
+                    stopped = False
+                except DownloadStopped:
+                    stopped = True
             
-            ftp.quit()
+            if stopped:
+                # Tell the server to stop sending the rest of the file
+                try:
+                    ftp.abort()
+                except ftplib.all_errors:
+                    pass
+                ftp.close()
+            else:
+                ftp.quit()
             
-            if not download_info['cancelled']:
-                download_info['status'] = 'Completed'
-                download_info['progress'] = 100
-                self.root.after(0, self.update_download_display, download_id)
-                self.add_to_history(download_info)
+            if download.finish():
+                self.root.after(0, self.mark_finished, download_id)
+                self.post_process(download, extractor)
+            elif extractor:
+                extractor.abort()
                 
         except Exception as e:
-            download_info['status'] = f'Error: {str(e)}'
-            download_info['error'] = str(e)
+            if extractor:
+                extractor.abort()
+            download.fail(str(e))
             self.root.after(0, self.update_download_display, download_id)
     
-    def update_progress(self, download_info, current_time, last_update, last_downloaded):
+    def update_progress(self, download, current_time, last_update, last_downloaded):
         # Calculate speed
         time_diff = current_time - last_update
-        bytes_diff = download_info['downloaded'] - last_downloaded
-        speed = bytes_diff / time_diff if time_diff > 0 else 0
-        
-        download_info['speed'] = speed
-        download_info['status'] = 'Downloading...'
-        
-        # Calculate progress
-        if download_info['size'] > 0:
-            progress = (download_info['downloaded'] / download_info['size']) * 100
-            download_info['progress'] = progress
+        bytes_diff = download.downloaded - last_downloaded
+        download.set_speed(bytes_diff / time_diff if time_diff > 0 else 0)
         
         # Update UI
-        self.root.after(0, self.update_download_display, download_info['id'])
+        self.root.after(0, self.update_download_display, download.id)
+    
+    def get_post_pool(self):
+        with self.post_lock:
+            if self.post_closed:
+                raise Exception("post-processing stopped")
+            if self.post_pool is None:
+                self.post_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.post_workers, mp_context=MP_CONTEXT)
+            return self.post_pool
+    
+    def reset_post_pool(self):
+        # Only a new worker count needs a new pool; queued jobs on the old
+        # pool still run to completion
+        workers = max(1, self.settings['post_workers'])
+        with self.post_lock:
+            if workers == self.post_workers:
+                return
+            self.post_workers = workers
+            pool, self.post_pool = self.post_pool, None
+            self.post_slots = threading.BoundedSemaphore(workers)
+            if pool is not None:
+                self.retired_post_pools.append(pool)
+                
+        if pool is not None:
+            pool.shutdown(wait=False)
+    
+    def open_stream_extractor(self, download, mode):
+        # Only fresh tar downloads can be unpacked on the fly; resumed or
+        # non-streamable archives are extracted after the download instead.
+        if mode != 'wb' or not self.settings['post_extract'] or archive_kind(download.filename) != 'tar':
+            return None
+            
+        slots = self.post_slots
+        if not slots.acquire(blocking=False):
+            return None
+        try:
+            extractor = StreamingExtractor(extract_dir(download.filepath), slots)
+        except Exception:
+            slots.release()
+            return None
+        self.stream_extractors.add(extractor)
+        return extractor
+    
+    def terminate_post_processing(self):
+        # shutdown() leaves running and queued jobs to finish, and the
+        # interpreter's exit hook waits for them; a command step can take an
+        # hour. Cancel the queue and kill the workers instead.
+        with self.post_lock:
+            self.post_closed = True
+            pools = self.retired_post_pools
+            if self.post_pool is not None:
+                pools.append(self.post_pool)
+            self.post_pool = None
+            self.retired_post_pools = []
+            
+        for pool in pools:
+            # No public way to reach the workers before terminate_workers() (3.14)
+            processes = list((pool._processes or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+                
+        for extractor in list(self.stream_extractors):
+            extractor.abort()
+    
+    def discard_post_pool(self, pool):
+        # A worker died; BrokenProcessPool would fail every later job too
+        with self.post_lock:
+            if self.post_pool is pool:
+                self.post_pool = None
+        pool.shutdown(wait=False)
+    
+    def post_process(self, download, extractor=None):
+        # Called on the download thread once the file is complete. The
+        # download itself is already done, so failures only go to post_status.
+        # History is written once the file has reached its final path.
+        try:
+            self.start_post_processing(download, extractor)
+        except Exception as e:
+            if extractor:
+                extractor.abort()
+            download.set_post_status(f"post-processing failed: {e}")
+            self.add_to_history(download)
+            self.root.after(0, self.update_download_display, download.id)
+    
+    def start_post_processing(self, download, extractor):
+        download.set_post_status(None)
+        steps = []
+        extracted = None
+        
+        if extractor and extractor.overflowed:
+            # Streaming fell behind the download; unpack from disk instead
+            extractor = None
+            
+        if extractor:
+            ok, message = extractor.close()
+            if ok:
+                extracted = message
+            else:
+                download.set_post_status(f"extract failed: {message}")
+        elif self.settings['post_extract'] and archive_kind(download.filename):
+            steps.append(('extract', None))
+            
+        for pattern, target in parse_move_rules(self.settings['post_move_rules']):
+            if fnmatch.fnmatch(download.filename.lower(), pattern):
+                steps.append(('move', target))
+                break
+                
+        if self.settings['post_command'].strip():
+            steps.append(('command', self.settings['post_command']))
+            
+        if not steps:
+            self.add_to_history(download)
+            if extractor:
+                self.root.after(0, self.update_download_display, download.id)
+            return
+            
+        # Keep an extraction error visible over the generic status
+        if download.post_status is None:
+            download.set_post_status("processing...")
+        self.root.after(0, self.update_download_display, download.id)
+        
+        # Wait for a free slot so pool jobs and streaming extractors together
+        # stay within post_workers processes
+        slots = self.post_slots
+        slots.acquire()
+        if self.post_closed:
+            # The window closed while this job waited for a slot
+            slots.release()
+            return
+            
+        pool = None
+        try:
+            pool = self.get_post_pool()
+            future = pool.submit(run_post_pipeline, download.filepath, steps, extracted)
+        except Exception as e:
+            slots.release()
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                self.discard_post_pool(pool)
+            raise
+        
+        def done(future):
+            slots.release()
+            if not self.post_closed:
+                self.root.after(0, self.post_process_done, download, pool, future)
+        future.add_done_callback(done)
+    
+    def post_process_done(self, download, pool, future):
+        # The download may have been spilled from the list meanwhile; it
+        # still gets its history entry.
+        try:
+            filepath = future.result()
+            download.rename(os.path.basename(filepath), filepath)
+            if download.post_status == "processing...":
+                download.set_post_status(None)
+        except Exception as e:
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                self.discard_post_pool(pool)
+            download.set_post_status(f"post-processing failed: {e}")
+            
+        self.add_to_history(download)
+        self.update_download_display(download.id)
     
     def update_download_display(self, download_id):
         if download_id not in self.downloads:
             return
             
-        download_info = self.downloads[download_id]
-        
-        # Format size
-        size_str = self.format_bytes(download_info['size']) if download_info['size'] > 0 else "Unknown"
-        progress_str = f"{download_info['progress']:.1f}%"
-        speed_str = f"{self.format_bytes(download_info['speed'])}/s"
-        
-        # Update treeview
-        self.tree.item(download_id, values=(
-            download_info['filename'],
-            download_info['protocol'],
+        # Rows are rendered in batches; off-screen downloads cost nothing here
+        self.list_model.invalidate()
+        self.schedule_refresh()
+    
+    def mark_finished(self, download_id):
+        if download_id in self.downloads:
+            self.finished_ids.append(download_id)
+        self.list_model.invalidate()
+        self.schedule_refresh()
+    
+    def schedule_refresh(self):
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.root.after(100, self.refresh_view)
+    
+    def refresh_view(self):
+        self.refresh_pending = False
+        self.spill_finished()
+        self.list_model.refresh()
+        self.render_rows()
+        
+    def spill_finished(self):
+        # Completed downloads go to history, drop the oldest from the list
+        keep = max(0, self.settings['finished_keep'])
+        spilled = []
+        while len(self.finished_ids) > keep:
+            download_id = self.finished_ids.popleft()
+            download = self.downloads.get(download_id)
+            if download and download.state == DONE:
+                del self.downloads[download_id]
+                spilled.append(download_id)
+                
+        if spilled:
+            self.list_model.remove_many(spilled)
+            if self.selected_id in spilled:
+                self.selected_id = None
+    
+    def format_row(self, snapshot):
+        size_str = self.format_bytes(snapshot.size) if snapshot.size > 0 else "Unknown"
+        progress_str = f"{snapshot.progress:.1f}%"
+        speed_str = f"{self.format_bytes(snapshot.speed)}/s"
+        
+        return (
+            snapshot.filename,
+            snapshot.host,
+            snapshot.protocol,
             size_str,
             progress_str,
             speed_str,
-            download_info['status']
-        ))
+            snapshot.status
+        )
+    
+    def render_rows(self):
+        total = len(self.list_model)
+        rows = self.visible_rows
+        self.view_offset = max(0, min(self.view_offset, total - rows))
+        
+        self.visible_ids = self.list_model.slice(self.view_offset, rows)
+        
+        # Reuse a fixed pool of row items, only touching rows whose text changed
+        for index, download_id in enumerate(self.visible_ids):
+            values = self.format_row(self.downloads[download_id].snapshot())
+            if index < len(self.row_values):
+                if self.row_values[index] != values:
+                    self.tree.item(f"row_{index}", values=values)
+                    self.row_values[index] = values
+            else:
+                self.tree.insert('', 'end', iid=f"row_{index}", values=values)
+                self.row_values.append(values)
+                
+        while len(self.row_values) > len(self.visible_ids):
+            self.row_values.pop()
+            self.tree.delete(f"row_{len(self.row_values)}")
+            
+        # Keep the selection on the same download while scrolling/sorting
+        if self.selected_id in self.visible_ids:
+            wanted = (f"row_{self.visible_ids.index(self.selected_id)}",)
+        else:
+            wanted = ()
+        if tuple(self.tree.selection()) != wanted:
+            self.tree.selection_set(wanted)
+            
+        if total:
+            self.tree_scrollbar.set(self.view_offset / total, (self.view_offset + len(self.visible_ids)) / total)
+        else:
+            self.tree_scrollbar.set(0, 1)
+    
+    def on_tree_resize(self, event):
+        rowheight = ttk.Style().lookup('Treeview', 'rowheight') or 20
+        try:
+            rowheight = int(rowheight)
+        except (TypeError, ValueError):
+            rowheight = 20
+            
+        # Leave room for the heading row
+        rows = max(1, (event.height - rowheight - 8) // rowheight)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.render_rows()
+    
+    def on_tree_scroll(self, *args):
+        total = len(self.list_model)
+        if args[0] == 'moveto':
+            self.view_offset = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.visible_rows
+            self.view_offset += amount
+        self.render_rows()
+    
+    def on_tree_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.on_tree_scroll('scroll', -3, 'units')
+        else:
+            self.on_tree_scroll('scroll', 3, 'units')
+        return "break"
+    
+    def on_tree_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            index = int(selection[0].split('_')[1])
+            if index < len(self.visible_ids):
+                self.selected_id = self.visible_ids[index]
+    
+    def get_selected_download(self):
+        if self.selected_id in self.downloads:
+            return self.selected_id
+        return None
+    
+    def sort_by(self, column):
+        self.list_model.set_sort(column)
+        for name, text in self.tree_headings.items():
+            if name == self.list_model.sort_column:
+                text += " \u25bc" if self.list_model.sort_reverse else " \u25b2"
+            self.tree.heading(name, text=text)
+        self.refresh_view()
+    
+    def apply_filters(self):
+        try:
+            min_size = int(float(self.min_size_var.get() or 0) * 1024 * 1024)
+        except ValueError:
+            min_size = 0
+            
+        self.list_model.set_filter(self.status_filter_var.get(), self.host_filter_var.get(), min_size)
+        self.view_offset = 0
+        self.refresh_view()
     
     def format_bytes(self, bytes_val):
         for unit in ['B', 'KB', 'MB', 'GB']:
@@ -533,61 +1847,48 @@ class DownloadManager:
         return f"{bytes_val:.1f} TB"
     
     def pause_download(self):
-        selection = self.tree.selection()
-        if not selection:
+        download_id = self.get_selected_download()
+        if not download_id:
             messagebox.showwarning("Warning", "Please select a download to pause")
             return
             
-        download_id = selection[0]
         if download_id in self.downloads:
-            self.downloads[download_id]['paused'] = True
-            self.downloads[download_id]['status'] = 'Paused'
-            self.update_download_display(download_id)
+            if self.downloads[download_id].pause():
+                self.update_download_display(download_id)
     
     def resume_download(self):
-        selection = self.tree.selection()
-        if not selection:
+        download_id = self.get_selected_download()
+        if not download_id:
             messagebox.showwarning("Warning", "Please select a download to resume")
             return
             
-        download_id = selection[0]
         if download_id in self.downloads:
-            self.downloads[download_id]['paused'] = False
-            self.downloads[download_id]['status'] = 'Downloading...'
-            self.update_download_display(download_id)
+            if self.downloads[download_id].resume():
+                self.update_download_display(download_id)
     
     def cancel_download(self):
-        selection = self.tree.selection()
-        if not selection:
+        download_id = self.get_selected_download()
+        if not download_id:
             messagebox.showwarning("Warning", "Please select a download to cancel")
             return
             
-        download_id = selection[0]
         if download_id in self.downloads:
-            self.downloads[download_id]['cancelled'] = True
-            self.downloads[download_id]['status'] = 'Cancelled'
-            self.update_download_display(download_id)
+            if self.downloads[download_id].cancel():
+                self.update_download_display(download_id)
     
     def retry_download(self):
-        selection = self.tree.selection()
-        if not selection:
+        download_id = self.get_selected_download()
+        if not download_id:
             messagebox.showwarning("Warning", "Please select a download to retry")
             return
             
-        download_id = selection[0]
         if download_id in self.downloads:
-            download_info = self.downloads[download_id]
-            if download_info['status'].startswith('Error') and download_info['retry_count'] < self.settings['max_retries']:
-                download_info['retry_count'] += 1
-                download_info['cancelled'] = False
-                download_info['paused'] = False
-                download_info['status'] = 'Retrying...'
-                download_info['error'] = None
-                
+            download = self.downloads[download_id]
+            if download.retry(self.settings['max_retries']):
                 # Start new download thread
                 thread = threading.Thread(target=self.download_file, args=(download_id,))
                 thread.daemon = True
-                download_info['thread'] = thread
+                download.thread = thread
                 thread.start()
                 
                 self.update_download_display(download_id)
@@ -595,14 +1896,13 @@ class DownloadManager:
                 messagebox.showinfo("Info", "Maximum retries reached or download not in error state")
     
     def open_file(self):
-        selection = self.tree.selection()
-        if not selection:
+        download_id = self.get_selected_download()
+        if not download_id:
             messagebox.showwarning("Warning", "Please select a download to open")
             return
             
-        download_id = selection[0]
         if download_id in self.downloads:
-            filepath = self.downloads[download_id]['filepath']
+            filepath = self.downloads[download_id].filepath
             if os.path.exists(filepath):
                 import subprocess
                 import platform
@@ -618,24 +1918,40 @@ class DownloadManager:
     
     def clear_completed(self):
         to_remove = []
-        for download_id, download_info in self.downloads.items():
-            if download_info['status'] in ['Completed', 'Cancelled'] or download_info['status'].startswith('Error'):
+        for download_id, download in self.downloads.items():
+            if download.state in TERMINAL_STATES:
                 to_remove.append(download_id)
         
         for download_id in to_remove:
-            self.tree.delete(download_id)
             del self.downloads[download_id]
+            
+        self.list_model.remove_many(to_remove)
+        self.finished_ids = deque(download_id for download_id in self.finished_ids if download_id in self.downloads)
+        self.refresh_view()
     
-    def add_to_history(self, download_info):
-        self.download_history.append({
-            'filename': download_info['filename'],
-            'url': download_info['url'],
-            'protocol': download_info['protocol'],
-            'filepath': download_info['filepath'],
+    def add_to_history(self, download):
+        snapshot = download.snapshot()
+        entry = {
+            'filename': snapshot.filename,
+            'url': snapshot.url,
+            'protocol': snapshot.protocol,
+            'filepath': snapshot.filepath,
             'completed_time': datetime.now().isoformat(),
-            'size': download_info['size']
-        })
-        self.save_history()
+            'size': snapshot.size
+        }
+        with self.history_lock:
+            self.download_history.append(entry)
+            self.history_unsaved.append(entry)
+            
+            # Batch history writes instead of touching the file per download
+            if self.history_save_pending:
+                return
+            self.history_save_pending = True
+            
+        # Written from a timer thread so the Tk loop never does file I/O here
+        timer = threading.Timer(1.0, self.save_history)
+        timer.daemon = True
+        timer.start()
     
     def save_settings(self):
         try:
@@ -650,6 +1966,16 @@ class DownloadManager:
             self.settings['proxy_host'] = self.proxy_host_var.get()
             self.settings['proxy_port'] = self.proxy_port_var.get()
             self.settings['user_agent'] = self.user_agent_var.get()
+            self.settings['finished_keep'] = int(self.finished_keep_var.get())
+            self.settings['dns_ttl'] = int(self.dns_ttl_var.get())
+            self.dns_cache.ttl = self.settings['dns_ttl']
+            self.settings['http2_hosts'] = self.http2_hosts_var.get()
+            self.reset_http2_client()
+            self.settings['post_extract'] = self.post_extract_var.get()
+            self.settings['post_move_rules'] = self.post_move_rules_var.get()
+            self.settings['post_command'] = self.post_command_var.get()
+            self.settings['post_workers'] = int(self.post_workers_var.get())
+            self.reset_post_pool()
             
             # Save to file
             settings_file = os.path.join(os.path.expanduser("~"), ".download_manager_settings.json")
@@ -685,6 +2011,13 @@ class DownloadManager:
                 self.proxy_host_var.set(self.settings['proxy_host'])
                 self.proxy_port_var.set(self.settings['proxy_port'])
                 self.user_agent_var.set(self.settings['user_agent'])
+                self.finished_keep_var.set(str(self.settings['finished_keep']))
+                self.dns_ttl_var.set(str(self.settings['dns_ttl']))
+                self.http2_hosts_var.set(self.settings['http2_hosts'])
+                self.post_extract_var.set(self.settings['post_extract'])
+                self.post_move_rules_var.set(self.settings['post_move_rules'])
+                self.post_command_var.set(self.settings['post_command'])
+                self.post_workers_var.set(str(self.settings['post_workers']))
                 
                 # Update protocol combo default
                 self.protocol_var.set(self.settings['default_protocol'])
@@ -705,10 +2038,20 @@ class DownloadManager:
             'proxy_enabled': False,
             'proxy_host': '',
             'proxy_port': '',
-            'ftp_passive': True
+            'ftp_passive': True,
+            'finished_keep': 100,
+            'dns_ttl': 300,
+            'http2_hosts': '',
+            'post_extract': False,
+            'post_move_rules': '',
+            'post_command': '',
+            'post_workers': 2
         }
         
         self.settings.update(default_settings)
+        self.dns_cache.ttl = self.settings['dns_ttl']
+        self.reset_http2_client()
+        self.reset_post_pool()
         
         # Update UI
         self.timeout_var.set(str(self.settings['timeout']))
@@ -721,15 +2064,37 @@ class DownloadManager:
         self.proxy_host_var.set(self.settings['proxy_host'])
         self.proxy_port_var.set(self.settings['proxy_port'])
         self.user_agent_var.set(self.settings['user_agent'])
+        self.finished_keep_var.set(str(self.settings['finished_keep']))
+        self.dns_ttl_var.set(str(self.settings['dns_ttl']))
+        self.http2_hosts_var.set(self.settings['http2_hosts'])
+        self.post_extract_var.set(self.settings['post_extract'])
+        self.post_move_rules_var.set(self.settings['post_move_rules'])
+        self.post_command_var.set(self.settings['post_command'])
+        self.post_workers_var.set(str(self.settings['post_workers']))
         self.protocol_var.set(self.settings['default_protocol'])
         
         messagebox.showinfo("Settings", "Settings reset to defaults!")
     
     def save_history(self):
         try:
-            history_file = os.path.join(os.path.expanduser("~"), ".download_manager_history.json")
-            with open(history_file, 'w') as f:
-                json.dump(self.download_history, f, indent=2)
+            with self.history_file_lock:
+                with self.history_lock:
+                    self.history_save_pending = False
+                    unsaved, self.history_unsaved = self.history_unsaved, []
+                if not unsaved:
+                    return
+                    
+                history_file = os.path.join(os.path.expanduser("~"), ".download_manager_history.json")
+                
+                # Only new entries are appended; the full rewrite is a fallback
+                # for a missing or unrecognized file
+                if append_json_list(history_file, unsaved):
+                    return
+                    
+                with self.history_lock:
+                    history = list(self.download_history)
+                with open(history_file, 'w') as f:
+                    json.dump(history, f, indent=2)
         except Exception as e:
             print(f"Error saving history: {e}")
     
@@ -742,6 +2107,13 @@ class DownloadManager:
         except Exception as e:
             print(f"Error loading history: {e}")
             self.download_history = []
+    
+    def on_close(self):
+        self.terminate_post_processing()
+        # The history timer is a daemon thread and dies with the interpreter,
+        # so write whatever it hasn't saved yet before closing
+        self.save_history()
+        self.root.destroy()
 
 def main():
     root = tk.Tk()
@@ -749,4 +2121,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Post-processing workers are spawned processes; needed for the frozen exe
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,213 @@
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+
+import pytest
+
+import main
+
+h2 = pytest.importorskip('h2')
+import h2.config
+import h2.connection
+import h2.events
+
+pytestmark = [
+    pytest.mark.skipif(main.httpx is None, reason="httpx[http2] is not installed"),
+    pytest.mark.skipif(shutil.which('openssl') is None, reason="openssl is needed for a test certificate"),
+]
+
+class H2Server:
+    # Local TLS server that only speaks h2. files maps a path to
+    # (body, content-disposition filename or None); Range is honoured.
+    def __init__(self, cert_dir, files):
+        self.files = files
+        self.connections = 0
+        self.alpn = []
+        self.requests = []
+
+        certfile = os.path.join(cert_dir, 'cert.pem')
+        keyfile = os.path.join(cert_dir, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=localhost', '-keyout', keyfile, '-out', certfile],
+                       check=True, capture_output=True)
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(certfile, keyfile)
+        self.context.set_alpn_protocols(['h2'])
+
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def url(self, path):
+        return f"https://localhost:{self.port}{path}"
+
+    def accept(self):
+        while True:
+            try:
+                sock, _ = self.sock.accept()
+                sock = self.context.wrap_socket(sock, server_side=True)
+            except OSError:
+                return
+            self.connections += 1
+            self.alpn.append(sock.selected_alpn_protocol())
+            threading.Thread(target=self.serve, args=(sock,), daemon=True).start()
+
+    def serve(self, sock):
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+        pending = {}
+
+        while True:
+            try:
+                data = sock.recv(65535)
+            except OSError:
+                return
+            if not data:
+                return
+
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    headers = {name.decode(): value.decode() for name, value in event.headers}
+                    body, filename = self.files[headers[':path']]
+                    start = int(headers['range'][len('bytes='):-1]) if 'range' in headers else None
+                    self.requests.append((headers[':path'], start))
+
+                    part = body[start or 0:]
+                    response = [(':status', '206' if start else '200'), ('content-length', str(len(part)))]
+                    if filename:
+                        response.append(('content-disposition', f'attachment; filename="{filename}"'))
+                    conn.send_headers(event.stream_id, response)
+                    pending[event.stream_id] = part
+
+            # Send what flow control allows; the rest goes after WINDOW_UPDATEs
+            for stream_id, part in list(pending.items()):
+                while part:
+                    size = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size, len(part))
+                    if size <= 0:
+                        break
+                    conn.send_data(stream_id, part[:size])
+                    part = part[size:]
+                pending[stream_id] = part
+                if not part:
+                    conn.end_stream(stream_id)
+                    del pending[stream_id]
+
+            sock.sendall(conn.data_to_send())
+
+    def close(self):
+        self.sock.close()
+
+class FakeRoot:
+    # Tk isn't available headless; the download threads only schedule UI updates
+    def after(self, delay, callback, *args):
+        pass
+
+def make_manager(download_dir):
+    manager = main.DownloadManager.__new__(main.DownloadManager)
+    manager.root = FakeRoot()
+    manager.downloads = {}
+    manager.download_dir = download_dir
+    manager.settings = {
+        'timeout': 10,
+        'max_retries': 1,
+        'chunk_size': 8192,
+        'user_agent': 'test',
+        'verify_ssl': False,
+        'proxy_enabled': False,
+        'proxy_host': '',
+        'proxy_port': '',
+        'http2_hosts': 'localhost',
+        'post_extract': False,
+        'post_move_rules': '',
+        'post_command': '',
+    }
+    manager.dns_cache = main.DNSCache()
+    manager.http2_client = None
+    manager.http2_config = None
+    manager.http2_streams = {}
+    manager.http2_lock = threading.Lock()
+    manager.download_history = []
+    manager.history_unsaved = []
+    manager.history_lock = threading.Lock()
+    # Keeps add_to_history from starting the timer that writes to ~
+    manager.history_save_pending = True
+    return manager
+
+def add(manager, url):
+    filename = os.path.basename(url)
+    download = main.DownloadState(f"download_{len(manager.downloads)}", url, filename,
+                                  os.path.join(manager.download_dir, filename))
+    manager.downloads[download.id] = download
+    return download
+
+@pytest.fixture
+def files():
+    return {}
+
+@pytest.fixture
+def server(tmp_path, files):
+    server = H2Server(tmp_path, files)
+    yield server
+    server.close()
+
+@pytest.fixture
+def manager(tmp_path):
+    download_dir = tmp_path / 'downloads'
+    download_dir.mkdir()
+    return make_manager(str(download_dir))
+
+def test_downloads_share_one_h2_connection(server, files, manager):
+    for index in range(8):
+        files[f'/file{index}.bin'] = (os.urandom(100000 + index), None)
+    downloads = [add(manager, server.url(path)) for path in files]
+
+    threads = [threading.Thread(target=manager.download_file, args=(download.id,)) for download in downloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    for download in downloads:
+        assert download.state == main.DONE, download.error
+        with open(download.filepath, 'rb') as f:
+            assert f.read() == files['/' + download.filename][0]
+
+    assert server.alpn == ['h2']
+    assert server.connections == 1
+    assert ('localhost', server.port) in manager.dns_cache.entries
+    manager.http2_client.close()
+
+@pytest.mark.parametrize('url_file', [b'unrelated partial file', None])
+def test_resume_after_content_disposition_rename(server, files, manager, url_file):
+    body = os.urandom(100000)
+    files['/file.bin'] = (body, 'real.bin')
+    url_path = os.path.join(manager.download_dir, 'file.bin')
+    real_path = os.path.join(manager.download_dir, 'real.bin')
+    if url_file is not None:
+        with open(url_path, 'wb') as f:
+            f.write(url_file)
+    with open(real_path, 'wb') as f:
+        f.write(body[:5000])
+
+    download = add(manager, server.url('/file.bin'))
+    manager.download_file(download.id)
+
+    assert download.state == main.DONE, download.error
+    assert download.filepath == real_path
+    # The first request is made for the URL's file name; once the real name
+    # is known the tail of real.bin is asked for instead
+    assert server.requests == [('/file.bin', len(url_file) if url_file else None), ('/file.bin', 5000)]
+    with open(real_path, 'rb') as f:
+        assert f.read() == body
+    if url_file is None:
+        assert not os.path.exists(url_path)
+    else:
+        with open(url_path, 'rb') as f:
+            assert f.read() == url_file
+    manager.http2_client.close()